@@ -2,8 +2,11 @@
 CogniTask AI - An AI-enhanced task manager built with Streamlit.
 """
 
+import threading
 import streamlit as st
+from contextlib import contextmanager
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
 from dateutil import parser as date_parser
 
 import database as db
@@ -18,7 +21,11 @@ st.set_page_config(
 )
 
 # --- Initialize Database ---
-db.init_db()
+try:
+    db.init_db()
+except db.OutdatedSchemaError as e:
+    st.error(str(e))
+    st.stop()
 
 
 # --- Session State Initialization ---
@@ -38,12 +45,65 @@ def init_session_state():
         st.session_state.breakdown_task_id = None
     if "breakdown_subtasks" not in st.session_state:
         st.session_state.breakdown_subtasks = None
+    if "task_page" not in st.session_state:
+        st.session_state.task_page = 0
 
 
 init_session_state()
 
 
+# --- Display Constants ---
+TASK_PAGE_SIZE = 50
+
+PRIORITY_OPTIONS = ("low", "medium", "high", "urgent")
+PRIORITY_INDEX = {priority: i for i, priority in enumerate(PRIORITY_OPTIONS)}
+
+STATUS_OPTIONS = ("todo", "inprogress", "done", "blocked")
+STATUS_INDEX = {status: i for i, status in enumerate(STATUS_OPTIONS)}
+
+# Task list filters, as keyword arguments for db.get_tasks_filtered
+TASK_FILTERS = {
+    "All": {},
+    "To Do": {"status": "todo"},
+    "In Progress": {"status": "inprogress"},
+    "Done": {"status": "done"},
+    "Blocked": {"status": "blocked"},
+    "Overdue": {"overdue": True}
+}
+
+PRIORITY_COLORS = {
+    "urgent": "red",
+    "high": "orange",
+    "medium": "blue",
+    "low": "gray"
+}
+
+STATUS_EMOJIS = {
+    "todo": "[ ]",
+    "inprogress": "[~]",
+    "done": "[x]",
+    "blocked": "[!]"
+}
+
+STATUS_DISPLAY = {
+    "todo": "todo",
+    "inprogress": "in progress",
+    "done": "done",
+    "blocked": "blocked"
+}
+
+
 # --- Helper Functions ---
+@contextmanager
+def request_session():
+    """Open a database session for one script or fragment run, closing it afterwards."""
+    session = db.get_db()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
 def format_date(dt: datetime | None) -> str:
     """Format a datetime for display."""
     if dt is None:
@@ -53,26 +113,88 @@ def format_date(dt: datetime | None) -> str:
     return dt.strftime("%b %d, %Y")
 
 
-def get_priority_color(priority: str) -> str:
-    """Get color for priority badge."""
-    colors = {
-        "urgent": "red",
-        "high": "orange",
-        "medium": "blue",
-        "low": "gray"
-    }
-    return colors.get(priority, "gray")
+def reset_task_page():
+    """Go back to the first page of the task list."""
+    st.session_state.task_page = 0
+
+
+def close_edit_form():
+    """Stop editing the current task."""
+    st.session_state.editing_task_id = None
+
+
+def close_breakdown_form():
+    """Close the breakdown form and discard any suggestions."""
+    st.session_state.breakdown_task_id = None
+    st.session_state.breakdown_subtasks = None
+
+
+def clear_breakdown_subtasks():
+    """Discard suggested sub-tasks so they can be regenerated."""
+    st.session_state.breakdown_subtasks = None
+
+
+class TasksVersion:
+    """Counter of task writes, shared by every browser session in the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def bump(self):
+        with self._lock:
+            self.value += 1
+
+
+@st.cache_resource
+def _get_tasks_version() -> TasksVersion:
+    """Get the process-wide tasks version; session state would restart at 0 per tab."""
+    return TasksVersion()
+
+
+def tasks_version() -> int:
+    """Get the current tasks version, the cache key for task data."""
+    return _get_tasks_version().value
+
+
+def bump_tasks_version():
+    """Invalidate cached task data after a create, update or delete."""
+    _get_tasks_version().bump()
+
+
+@st.cache_data(ttl=30)
+def _cached_stats(_session, version: int) -> dict:
+    """Get task stats, cached until the tasks version changes."""
+    return db.get_task_stats(_session)
+
+
+@st.cache_data(ttl=10)
+def _cached_task_page(_session, version: int, filter_label: str, page: int) -> list:
+    """
+    Get one page of the task list (plus one extra row to detect a next page),
+    cached until the tasks version, filter or page changes.
+    """
+    return db.get_tasks_filtered(
+        _session,
+        **TASK_FILTERS[filter_label],
+        limit=TASK_PAGE_SIZE + 1,
+        offset=page * TASK_PAGE_SIZE
+    )
+
 
+@st.cache_data(ttl=60)
+def _parent_task_options(_session, version: int) -> list[tuple[str, str]]:
+    """Get (task_id, short title) pairs for the parent task selectbox, cached until the tasks version changes."""
+    return [(t.task_id, t.title[:50]) for t in db.get_all_tasks_summary(_session)]
 
-def get_status_emoji(status: str) -> str:
-    """Get emoji for status."""
-    emojis = {
-        "todo": "[ ]",
-        "inprogress": "[~]",
-        "done": "[x]",
-        "blocked": "[!]"
-    }
-    return emojis.get(status, "[ ]")
+
+@lru_cache(maxsize=256)
+def _parse_cached(date_str: str) -> datetime:
+    """Parse a date string, trying the fast ISO format path before dateutil."""
+    try:
+        return datetime.fromisoformat(date_str)
+    except ValueError:
+        return date_parser.parse(date_str)
 
 
 def parse_due_date(date_str: str | None) -> datetime | None:
@@ -80,13 +202,13 @@ def parse_due_date(date_str: str | None) -> datetime | None:
     if not date_str:
         return None
     try:
-        return date_parser.parse(date_str).replace(tzinfo=timezone.utc)
+        return _parse_cached(date_str).replace(tzinfo=timezone.utc)
     except Exception:
         return None
 
 
 # --- Sidebar ---
-def render_sidebar():
+def render_sidebar(session):
     """Render the sidebar with navigation and stats."""
     with st.sidebar:
         st.title("CogniTask AI")
@@ -107,21 +229,17 @@ def render_sidebar():
 
         # Stats
         st.subheader("Stats")
-        session = db.get_db()
-        try:
-            stats = db.get_task_stats(session)
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric("Total", stats["total"])
-                st.metric("To Do", stats["todo"])
-                st.metric("Done", stats["done"])
-            with col2:
-                st.metric("In Progress", stats["inprogress"])
-                st.metric("Blocked", stats["blocked"])
-                if stats["overdue"] > 0:
-                    st.metric("Overdue", stats["overdue"])
-        finally:
-            session.close()
+        stats = _cached_stats(session, tasks_version())
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Total", stats["total"])
+            st.metric("To Do", stats["todo"])
+            st.metric("Done", stats["done"])
+        with col2:
+            st.metric("In Progress", stats["inprogress"])
+            st.metric("Blocked", stats["blocked"])
+            if stats["overdue"] > 0:
+                st.metric("Overdue", stats["overdue"])
 
         st.divider()
 
@@ -135,7 +253,7 @@ def render_sidebar():
 
 
 # --- Task List View ---
-def render_task_list():
+def render_task_list(session):
     """Render the main task list view."""
     st.header("Tasks")
 
@@ -158,96 +276,147 @@ def render_task_list():
     with col3:
         filter_status = st.selectbox(
             "Filter by status",
-            ["All", "To Do", "In Progress", "Done", "Blocked"],
-            label_visibility="collapsed"
+            list(TASK_FILTERS),
+            key="task_filter",
+            label_visibility="collapsed",
+            on_change=reset_task_page
         )
 
     # Add task form
     if st.session_state.show_add_form:
-        render_add_task_form()
+        render_add_task_form(session)
 
     # AI input form
     if st.session_state.show_ai_input:
-        render_ai_input_form()
+        render_ai_input_form(session)
 
     # Get and display tasks
-    session = db.get_db()
-    try:
-        status_map = {
-            "All": None,
-            "To Do": "todo",
-            "In Progress": "inprogress",
-            "Done": "done",
-            "Blocked": "blocked"
-        }
-        status_filter = status_map.get(filter_status)
-
-        if status_filter:
-            all_tasks = db.get_tasks_by_status(session, status_filter)
-        else:
-            all_tasks = db.get_all_tasks(session)
+    page = st.session_state.task_page
+    all_tasks = _cached_task_page(session, tasks_version(), filter_status, page)
+    has_next = len(all_tasks) > TASK_PAGE_SIZE
+    all_tasks = all_tasks[:TASK_PAGE_SIZE]
+
+    # Forms opened from elsewhere (e.g. Focus Mode) may be for a task on another page
+    page_task_ids = {t.task_id for t in all_tasks}
+    if st.session_state.editing_task_id and st.session_state.editing_task_id not in page_task_ids:
+        render_edit_task_form(st.session_state.editing_task_id)
+    if st.session_state.breakdown_task_id and st.session_state.breakdown_task_id not in page_task_ids:
+        render_breakdown_form(st.session_state.breakdown_task_id)
+
+    if not all_tasks and page == 0:
+        st.info("No tasks yet. Add your first task above!")
+    else:
+        # Build task hierarchy
+        render_task_hierarchy(all_tasks)
+
+    # Pagination controls
+    if page > 0 or has_next:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("Previous", use_container_width=True, disabled=page == 0):
+                st.session_state.task_page -= 1
+                st.rerun()
+        with col2:
+            st.caption(f"Page {page + 1}")
+        with col3:
+            if st.button("Next", use_container_width=True, disabled=not has_next):
+                st.session_state.task_page += 1
+                st.rerun()
 
-        if not all_tasks:
-            st.info("No tasks yet. Add your first task above!")
-        else:
-            # Build task hierarchy
-            render_task_hierarchy(session, all_tasks)
 
-    finally:
-        session.close()
+def submit_add_task_form(task_options: dict):
+    """Create a task from the add task form, before the script reruns."""
+    title = st.session_state.add_title.strip()
+    if not title:
+        return
+    description = st.session_state.add_description
+    due_date = st.session_state.add_due_date
+
+    with request_session() as session:
+        db.create_task(
+            session,
+            title=title,
+            description=description.strip() if description else None,
+            priority=st.session_state.add_priority,
+            due_date=datetime.combine(due_date, datetime.min.time()).replace(tzinfo=timezone.utc) if due_date else None,
+            parent_task_id=task_options.get(st.session_state.add_parent)
+        )
+    bump_tasks_version()
+    st.session_state.show_add_form = False
+    st.toast("Task created!")
 
 
-def render_add_task_form():
-    """Render the manual add task form."""
+def render_add_task_form(session):
+    """
+    Render the manual add task form.
+    Submitting is handled by a callback, so the form submit's own rerun
+    already shows the new task.
+    """
     with st.expander("Add New Task", expanded=True):
         with st.form("add_task_form"):
-            title = st.text_input("Title*", max_chars=255)
-            description = st.text_area("Description (optional)", max_chars=10000)
+            title = st.text_input("Title*", max_chars=255, key="add_title")
+            st.text_area("Description (optional)", max_chars=10000, key="add_description")
 
             col1, col2 = st.columns(2)
             with col1:
-                priority = st.selectbox("Priority", ["medium", "low", "high", "urgent"])
+                st.selectbox("Priority", PRIORITY_OPTIONS, index=PRIORITY_INDEX["medium"], key="add_priority")
             with col2:
-                due_date = st.date_input("Due Date (optional)", value=None)
+                st.date_input("Due Date (optional)", value=None, key="add_due_date")
 
             # Parent task selection
-            session = db.get_db()
-            try:
-                all_tasks = db.get_all_tasks(session)
-                task_options = {"None": None}
-                for task in all_tasks:
-                    task_options[f"{task.title[:50]}..."] = task.task_id
-                parent = st.selectbox("Parent Task (optional)", options=list(task_options.keys()))
-            finally:
-                session.close()
-
-            submitted = st.form_submit_button("Create Task", use_container_width=True)
-
-            if submitted:
-                if not title.strip():
-                    st.error("Title is required")
-                else:
-                    session = db.get_db()
-                    try:
-                        due_dt = datetime.combine(due_date, datetime.min.time()).replace(tzinfo=timezone.utc) if due_date else None
-                        parent_id = task_options.get(parent)
+            options = _parent_task_options(session, tasks_version())
+            task_options = {"None": None, **{f"{short_title}...": task_id for task_id, short_title in options}}
+            st.selectbox("Parent Task (optional)", options=list(task_options.keys()), key="add_parent")
+
+            submitted = st.form_submit_button(
+                "Create Task",
+                use_container_width=True,
+                on_click=submit_add_task_form,
+                args=(task_options,)
+            )
+
+            if submitted and not title.strip():
+                st.error("Title is required")
+
+
+# Widget keys of the AI preview form, cleared whenever a new parse result arrives
+AI_PREVIEW_KEYS = ("ai_title", "ai_description", "ai_priority", "ai_due_date")
+
+
+def submit_ai_task_form():
+    """Create the task confirmed in the AI preview form, before the script reruns."""
+    title = st.session_state.ai_title.strip()
+    if not title:
+        return
+    description = st.session_state.ai_description
+    due_date = st.session_state.ai_due_date
+
+    with request_session() as session:
+        task = db.create_task(
+            session,
+            title=title,
+            description=description.strip() if description else None,
+            priority=st.session_state.ai_priority,
+            due_date=datetime.combine(due_date, datetime.min.time()).replace(tzinfo=timezone.utc) if due_date else None
+        )
+        sub_tasks = st.session_state.ai_parsed_task.get("sub_tasks")
+        if sub_tasks:
+            db.create_tasks_bulk(session, [
+                {"title": subtask_title, "parent_task_id": task.task_id, "priority": task.priority}
+                for subtask_title in sub_tasks
+            ])
+    bump_tasks_version()
+    st.session_state.ai_parsed_task = None
+    st.session_state.show_ai_input = False
+    st.toast("Task created!")
 
-                        db.create_task(
-                            session,
-                            title=title.strip(),
-                            description=description.strip() if description else None,
-                            priority=priority,
-                            due_date=due_dt,
-                            parent_task_id=parent_id
-                        )
-                        st.success("Task created!")
-                        st.session_state.show_add_form = False
-                        st.rerun()
-                    finally:
-                        session.close()
 
+def discard_ai_task():
+    """Drop the parsed task preview."""
+    st.session_state.ai_parsed_task = None
 
-def render_ai_input_form():
+
+def render_ai_input_form(session):
     """Render the AI-powered task input form."""
     with st.expander("AI Task Input", expanded=True):
         st.caption("Describe your task naturally, and AI will parse it for you.")
@@ -257,15 +426,21 @@ def render_ai_input_form():
             placeholder="e.g., Call mom tomorrow - it's urgent\ne.g., Finish the report by Friday, high priority",
             key="ai_input_text"
         )
+        with_subtasks = st.checkbox("Also suggest sub-tasks", key="ai_with_subtasks")
 
         col1, col2 = st.columns(2)
         with col1:
             if st.button("Parse with AI", use_container_width=True):
                 if user_input.strip():
                     with st.spinner("AI is parsing your input..."):
-                        result = gemini_utils.parse_task_input(user_input)
+                        # Parsing and breakdown run concurrently, so sub-tasks cost no extra wait
+                        parse = gemini_utils.parse_and_breakdown if with_subtasks else gemini_utils.aparse_task_input
+                        result = gemini_utils.run_async(parse(user_input))
                         if result:
                             st.session_state.ai_parsed_task = result
+                            # Keyed widgets keep their old values, so reset the preview
+                            for key in AI_PREVIEW_KEYS:
+                                st.session_state.pop(key, None)
                             st.rerun()
                         else:
                             st.error("Failed to parse input. Try being more specific.")
@@ -286,127 +461,124 @@ def render_ai_input_form():
             parsed = st.session_state.ai_parsed_task
 
             with st.form("confirm_ai_task"):
-                title = st.text_input("Title", value=parsed.get("title", ""), max_chars=255)
-                description = st.text_area("Description", value=parsed.get("description") or "")
-                priority = st.selectbox(
+                title = st.text_input("Title", value=parsed.get("title", ""), max_chars=255, key="ai_title")
+                st.text_area("Description", value=parsed.get("description") or "", key="ai_description")
+                st.selectbox(
                     "Priority",
-                    ["low", "medium", "high", "urgent"],
-                    index=["low", "medium", "high", "urgent"].index(parsed.get("priority", "medium"))
+                    PRIORITY_OPTIONS,
+                    index=PRIORITY_INDEX.get(parsed.get("priority", "medium"), 1),
+                    key="ai_priority"
                 )
-                due_str = parsed.get("due_date")
-                if due_str:
-                    try:
-                        due_val = date_parser.parse(due_str).date()
-                    except Exception:
-                        due_val = None
-                else:
-                    due_val = None
-                due_date = st.date_input("Due Date", value=due_val)
+                due_dt = parse_due_date(parsed.get("due_date"))
+                due_val = due_dt.date() if due_dt else None
+                st.date_input("Due Date", value=due_val, key="ai_due_date")
+
+                if parsed.get("sub_tasks"):
+                    st.write("**Suggested sub-tasks:**")
+                    for i, subtask in enumerate(parsed["sub_tasks"], 1):
+                        st.write(f"{i}. {subtask}")
 
                 col1, col2 = st.columns(2)
                 with col1:
-                    if st.form_submit_button("Create Task", use_container_width=True, type="primary"):
-                        if title.strip():
-                            session = db.get_db()
-                            try:
-                                due_dt = datetime.combine(due_date, datetime.min.time()).replace(tzinfo=timezone.utc) if due_date else None
-                                db.create_task(
-                                    session,
-                                    title=title.strip(),
-                                    description=description.strip() if description else None,
-                                    priority=priority,
-                                    due_date=due_dt
-                                )
-                                st.success("Task created!")
-                                st.session_state.ai_parsed_task = None
-                                st.session_state.show_ai_input = False
-                                st.rerun()
-                            finally:
-                                session.close()
-                        else:
-                            st.error("Title is required")
+                    created = st.form_submit_button(
+                        "Create Task",
+                        use_container_width=True,
+                        type="primary",
+                        on_click=submit_ai_task_form
+                    )
+                    if created and not title.strip():
+                        st.error("Title is required")
 
                 with col2:
-                    if st.form_submit_button("Discard", use_container_width=True):
-                        st.session_state.ai_parsed_task = None
-                        st.rerun()
+                    st.form_submit_button("Discard", use_container_width=True, on_click=discard_ai_task)
 
 
-def render_task_hierarchy(session, all_tasks: list):
+def render_task_hierarchy(all_tasks: list):
     """Render tasks in a hierarchical view."""
     # Build lookup maps
-    tasks_by_id = {t.task_id: t for t in all_tasks}
+    task_ids = {t.task_id for t in all_tasks}
     children_map = {}
     for task in all_tasks:
         if task.parent_task_id:
-            if task.parent_task_id not in children_map:
-                children_map[task.parent_task_id] = []
-            children_map[task.parent_task_id].append(task)
+            children_map.setdefault(task.parent_task_id, []).append(task)
 
     # Find root tasks (no parent or parent not in current view)
-    root_tasks = [t for t in all_tasks if not t.parent_task_id or t.parent_task_id not in tasks_by_id]
+    root_tasks = [t for t in all_tasks if not t.parent_task_id or t.parent_task_id not in task_ids]
+
+    # Render each root's subtree depth-first with an explicit stack
+    for root in root_tasks:
+        stack = [(root, 0)]
+        while stack:
+            task, indent_level = stack.pop()
+            _render_single(task, indent_level)
+            stack.extend((child, indent_level + 1) for child in reversed(children_map.get(task.task_id, ())))
+        st.divider()
 
-    def render_task(task, indent_level=0):
-        """Render a single task with its children."""
-        indent = "    " * indent_level
 
-        # Check if we're editing this task
-        is_editing = st.session_state.editing_task_id == task.task_id
-        is_breaking_down = st.session_state.breakdown_task_id == task.task_id
+def _render_single(task, indent_level: int):
+    """Render a single task row, plus its edit/breakdown forms if open."""
+    indent = "    " * indent_level
 
-        with st.container():
-            # Task header
-            status_emoji = get_status_emoji(task.status)
-            priority_color = get_priority_color(task.priority)
+    # Check if we're editing this task
+    is_editing = st.session_state.editing_task_id == task.task_id
+    is_breaking_down = st.session_state.breakdown_task_id == task.task_id
 
-            col1, col2, col3 = st.columns([3, 1, 1])
+    with st.container():
+        # Task header
+        col1, col2, col3 = st.columns([3, 1, 1])
 
-            with col1:
-                task_label = f"{indent}{status_emoji} **{task.title}**"
-                if task.priority in ["urgent", "high"]:
-                    task_label += f" :{priority_color}[{task.priority}]"
-                st.markdown(task_label)
-
-                if task.due_date:
-                    due_str = format_date(task.due_date)
-                    now = datetime.now(timezone.utc)
-                    task_due = task.due_date if task.due_date.tzinfo else task.due_date.replace(tzinfo=timezone.utc)
-                    if task_due < now and task.status not in ["done"]:
-                        st.caption(f"{indent}:red[Overdue: {due_str}]")
-                    else:
-                        st.caption(f"{indent}Due: {due_str}")
+        with col1:
+            label_parts = [indent, STATUS_EMOJIS.get(task.status, "[ ]"), " **", task.title, "**"]
+            if task.priority in ("urgent", "high"):
+                label_parts += [" :", PRIORITY_COLORS.get(task.priority, "gray"), "[", task.priority, "]"]
+            st.markdown("".join(label_parts))
 
-            with col2:
-                status_display = task.status.replace("inprogress", "in progress")
-                st.caption(status_display)
+            if task.due_date:
+                due_str = format_date(task.due_date)
+                if task.is_overdue:
+                    st.caption(f"{indent}:red[Overdue: {due_str}]")
+                else:
+                    st.caption(f"{indent}Due: {due_str}")
 
-            with col3:
-                if st.button("Edit", key=f"edit_{task.task_id}", use_container_width=True):
-                    st.session_state.editing_task_id = task.task_id if not is_editing else None
-                    st.session_state.breakdown_task_id = None
-                    st.rerun()
+        with col2:
+            st.caption(STATUS_DISPLAY.get(task.status, task.status))
 
-        # Edit form
-        if is_editing:
-            render_edit_task_form(session, task)
+        with col3:
+            if st.button("Edit", key=f"edit_{task.task_id}", use_container_width=True):
+                st.session_state.editing_task_id = task.task_id if not is_editing else None
+                st.session_state.breakdown_task_id = None
+                st.rerun()
 
-        # Breakdown form
-        if is_breaking_down:
-            render_breakdown_form(session, task)
+    # Edit form
+    if is_editing:
+        render_edit_task_form(task.task_id)
 
-        # Render children
-        children = children_map.get(task.task_id, [])
-        for child in children:
-            render_task(child, indent_level + 1)
+    # Breakdown form
+    if is_breaking_down:
+        render_breakdown_form(task.task_id)
 
-    # Render all root tasks
-    for task in root_tasks:
-        render_task(task)
-        st.divider()
+
+@st.fragment
+def render_edit_task_form(task_id: str):
+    """
+    Render the edit form for a task.
+    Runs as a fragment, so interacting with the form only reruns this form.
+    Cancel closes it through a callback; changes that affect the rest of
+    the page still trigger a full rerun.
+    """
+    # Fragment-only reruns skip main(), so the fragment scopes its own session
+    with request_session() as session:
+        _render_edit_task_form(session, task_id)
 
 
-def render_edit_task_form(session, task):
-    """Render the edit form for a task."""
+def _render_edit_task_form(session, task_id: str):
+    """Body of render_edit_task_form."""
+    if st.session_state.editing_task_id != task_id:
+        return
+    task = db.get_task_by_id(session, task_id)
+    if not task:
+        return
+
     with st.container():
         st.subheader("Edit Task")
 
@@ -418,14 +590,14 @@ def render_edit_task_form(session, task):
             with col1:
                 status = st.selectbox(
                     "Status",
-                    ["todo", "inprogress", "done", "blocked"],
-                    index=["todo", "inprogress", "done", "blocked"].index(task.status)
+                    STATUS_OPTIONS,
+                    index=STATUS_INDEX.get(task.status, 0)
                 )
             with col2:
                 priority = st.selectbox(
                     "Priority",
-                    ["low", "medium", "high", "urgent"],
-                    index=["low", "medium", "high", "urgent"].index(task.priority)
+                    PRIORITY_OPTIONS,
+                    index=PRIORITY_INDEX.get(task.priority, 1)
                 )
 
             due_val = task.due_date.date() if task.due_date else None
@@ -448,15 +620,14 @@ def render_edit_task_form(session, task):
                             due_date=due_dt,
                             clear_due_date=clear_due
                         )
+                        bump_tasks_version()
                         st.session_state.editing_task_id = None
                         st.rerun()
                     else:
                         st.error("Title is required")
 
             with col2:
-                if st.form_submit_button("Cancel", use_container_width=True):
-                    st.session_state.editing_task_id = None
-                    st.rerun()
+                st.form_submit_button("Cancel", use_container_width=True, on_click=close_edit_form)
 
             with col3:
                 if st.form_submit_button("Breakdown", use_container_width=True, disabled=not gemini_utils.is_configured()):
@@ -466,32 +637,46 @@ def render_edit_task_form(session, task):
 
             with col4:
                 if st.form_submit_button("Delete", use_container_width=True):
-                    if db.has_subtasks(session, task.task_id):
+                    if not db.delete_task(session, task.task_id):
                         st.error("Cannot delete: task has subtasks")
                     else:
-                        db.delete_task(session, task.task_id)
+                        bump_tasks_version()
                         st.session_state.editing_task_id = None
                         st.rerun()
 
 
-def render_breakdown_form(session, task):
-    """Render the AI breakdown form for a task."""
+@st.fragment
+def render_breakdown_form(task_id: str):
+    """
+    Render the AI breakdown form for a task.
+    Runs as a fragment, like the edit form.
+    """
+    with request_session() as session:
+        _render_breakdown_form(session, task_id)
+
+
+def _render_breakdown_form(session, task_id: str):
+    """Body of render_breakdown_form."""
+    if st.session_state.breakdown_task_id != task_id:
+        return
+    task = db.get_task_by_id(session, task_id)
+    if not task:
+        return
+
     with st.container():
         st.subheader(f"Break Down: {task.title}")
 
         if st.session_state.breakdown_subtasks is None:
             if st.button("Generate Sub-tasks with AI", key=f"gen_breakdown_{task.task_id}"):
                 with st.spinner("AI is breaking down your task..."):
-                    subtasks = gemini_utils.breakdown_task(task.title, task.description)
+                    subtasks = gemini_utils.run_async(gemini_utils.abreakdown_task(task.title, task.description))
                     if subtasks:
                         st.session_state.breakdown_subtasks = subtasks
                         st.rerun()
                     else:
                         st.error("Failed to generate sub-tasks. Try again.")
 
-            if st.button("Cancel", key=f"cancel_breakdown_{task.task_id}"):
-                st.session_state.breakdown_task_id = None
-                st.rerun()
+            st.button("Cancel", key=f"cancel_breakdown_{task.task_id}", on_click=close_breakdown_form)
 
         else:
             st.write("**Suggested sub-tasks:**")
@@ -501,130 +686,124 @@ def render_breakdown_form(session, task):
             col1, col2, col3 = st.columns(3)
             with col1:
                 if st.button("Create All", key=f"create_all_{task.task_id}", type="primary"):
-                    for subtask_title in st.session_state.breakdown_subtasks:
-                        db.create_task(
-                            session,
-                            title=subtask_title,
-                            parent_task_id=task.task_id,
-                            priority=task.priority  # Inherit parent priority
-                        )
+                    rows = [
+                        {"title": subtask_title, "parent_task_id": task.task_id, "priority": task.priority}  # Inherit parent priority
+                        for subtask_title in st.session_state.breakdown_subtasks
+                    ]
+                    db.create_tasks_bulk(session, rows)
+                    bump_tasks_version()
                     st.session_state.breakdown_task_id = None
                     st.session_state.breakdown_subtasks = None
-                    st.success(f"Created {len(st.session_state.breakdown_subtasks)} sub-tasks!")
+                    st.success(f"Created {len(rows)} sub-tasks!")
                     st.rerun()
 
             with col2:
-                if st.button("Regenerate", key=f"regen_{task.task_id}"):
-                    st.session_state.breakdown_subtasks = None
-                    st.rerun()
+                st.button("Regenerate", key=f"regen_{task.task_id}", on_click=clear_breakdown_subtasks)
 
             with col3:
-                if st.button("Cancel", key=f"cancel2_{task.task_id}"):
-                    st.session_state.breakdown_task_id = None
-                    st.session_state.breakdown_subtasks = None
-                    st.rerun()
+                st.button("Cancel", key=f"cancel2_{task.task_id}", on_click=close_breakdown_form)
 
 
 # --- Focus Mode View ---
-def render_focus_mode():
+def render_focus_mode(session):
     """Render the Focus Mode view."""
     st.header("Focus Mode")
     st.caption("What should you work on next?")
 
-    session = db.get_db()
-    try:
-        task = db.get_next_priority_task(session)
+    task = db.get_next_priority_task(session)
 
-        if not task:
-            st.info("You're all caught up! No pending tasks.")
-            if st.button("Go to Task List"):
-                st.session_state.current_view = "tasks"
-                st.rerun()
-            return
-
-        # Display the priority task prominently
-        st.divider()
+    if not task:
+        st.info("You're all caught up! No pending tasks.")
+        if st.button("Go to Task List"):
+            st.session_state.current_view = "tasks"
+            st.rerun()
+        return
 
-        priority_color = get_priority_color(task.priority)
-        st.markdown(f"### {task.title}")
+    # Display the priority task prominently
+    st.divider()
 
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.markdown(f"**Priority:** :{priority_color}[{task.priority.upper()}]")
-        with col2:
-            st.markdown(f"**Status:** {task.status}")
-        with col3:
-            if task.due_date:
-                st.markdown(f"**Due:** {format_date(task.due_date)}")
-            else:
-                st.markdown("**Due:** Not set")
+    priority_color = PRIORITY_COLORS.get(task.priority, "gray")
+    st.markdown(f"### {task.title}")
 
-        if task.description:
-            st.markdown("**Description:**")
-            st.write(task.description)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown(f"**Priority:** :{priority_color}[{task.priority.upper()}]")
+    with col2:
+        st.markdown(f"**Status:** {task.status}")
+    with col3:
+        if task.due_date:
+            st.markdown(f"**Due:** {format_date(task.due_date)}")
+        else:
+            st.markdown("**Due:** Not set")
 
-        st.divider()
+    if task.description:
+        st.markdown("**Description:**")
+        st.write(task.description)
 
-        # Action buttons
-        st.subheader("Quick Actions")
-        col1, col2, col3, col4 = st.columns(4)
+    st.divider()
 
-        with col1:
-            if st.button("Mark Done", use_container_width=True, type="primary"):
-                db.update_task(session, task.task_id, status="done")
-                st.success("Marked as done!")
-                st.rerun()
+    # Action buttons
+    st.subheader("Quick Actions")
+    col1, col2, col3, col4 = st.columns(4)
 
-        with col2:
-            if task.status == "todo":
-                if st.button("Start Working", use_container_width=True):
-                    db.update_task(session, task.task_id, status="inprogress")
-                    st.rerun()
-            else:
-                if st.button("Back to To Do", use_container_width=True):
-                    db.update_task(session, task.task_id, status="todo")
-                    st.rerun()
+    with col1:
+        if st.button("Mark Done", use_container_width=True, type="primary"):
+            db.update_task(session, task.task_id, status="done")
+            bump_tasks_version()
+            st.success("Marked as done!")
+            st.rerun()
 
-        with col3:
-            if st.button("Mark Blocked", use_container_width=True):
-                db.update_task(session, task.task_id, status="blocked")
+    with col2:
+        if task.status == "todo":
+            if st.button("Start Working", use_container_width=True):
+                db.update_task(session, task.task_id, status="inprogress")
+                bump_tasks_version()
                 st.rerun()
-
-        with col4:
-            if st.button("Edit Task", use_container_width=True):
-                st.session_state.current_view = "tasks"
-                st.session_state.editing_task_id = task.task_id
+        else:
+            if st.button("Back to To Do", use_container_width=True):
+                db.update_task(session, task.task_id, status="todo")
+                bump_tasks_version()
                 st.rerun()
 
-        # Show sub-tasks if any
-        subtasks = db.get_subtasks(session, task.task_id)
-        if subtasks:
-            st.divider()
-            st.subheader("Sub-tasks")
-            for subtask in subtasks:
-                status_emoji = get_status_emoji(subtask.status)
-                st.write(f"{status_emoji} {subtask.title}")
+    with col3:
+        if st.button("Mark Blocked", use_container_width=True):
+            db.update_task(session, task.task_id, status="blocked")
+            bump_tasks_version()
+            st.rerun()
+
+    with col4:
+        if st.button("Edit Task", use_container_width=True):
+            st.session_state.current_view = "tasks"
+            st.session_state.editing_task_id = task.task_id
+            st.rerun()
 
-        # Progress indicator
+    # Show sub-tasks if any
+    subtasks = db.get_subtasks_rows(session, task.task_id)
+    if subtasks:
         st.divider()
-        stats = db.get_task_stats(session)
-        total_incomplete = stats["todo"] + stats["inprogress"]
-        if total_incomplete > 0:
-            st.caption(f"{total_incomplete} task(s) remaining")
+        st.subheader("Sub-tasks")
+        for subtask in subtasks:
+            status_emoji = STATUS_EMOJIS.get(subtask["status"], "[ ]")
+            st.write(f"{status_emoji} {subtask['title']}")
 
-    finally:
-        session.close()
+    # Progress indicator
+    st.divider()
+    stats = _cached_stats(session, tasks_version())
+    total_incomplete = stats["todo"] + stats["inprogress"]
+    if total_incomplete > 0:
+        st.caption(f"{total_incomplete} task(s) remaining")
 
 
 # --- Main App ---
 def main():
     """Main application entry point."""
-    render_sidebar()
+    with request_session() as session:
+        render_sidebar(session)
 
-    if st.session_state.current_view == "tasks":
-        render_task_list()
-    elif st.session_state.current_view == "focus":
-        render_focus_mode()
+        if st.session_state.current_view == "tasks":
+            render_task_list(session)
+        elif st.session_state.current_view == "focus":
+            render_focus_mode(session)
 
 
 if __name__ == "__main__":
@@ -5,38 +5,109 @@ Uses SQLAlchemy ORM with SQLite.
 
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, case
-from sqlalchemy.orm import declarative_base, sessionmaker, Session
+from enum import Enum, IntEnum
+from sqlalchemy import create_engine, event, text, select, insert, update, delete, bindparam, exists, and_, func, case, Column, Integer, SmallInteger, String, Text, DateTime, LargeBinary, Index, TypeDecorator, Row, inspect
+from sqlalchemy.orm import declarative_base, sessionmaker, Session, make_transient_to_detached
+from sqlalchemy.schema import CreateIndex
 
 # Database setup
 DATABASE_URL = "sqlite:///cognitask.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=10,
+    max_overflow=20,
+    pool_pre_ping=True
+)
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Tune every new SQLite connection.
+    WAL lets readers run alongside a writer, and synchronous=NORMAL skips the fsync on each commit.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-# Priority order for sorting (higher number = higher priority)
-PRIORITY_ORDER = {
-    "urgent": 4,
-    "high": 3,
-    "medium": 2,
-    "low": 1
-}
 
-VALID_STATUSES = ["todo", "inprogress", "done", "blocked"]
-VALID_PRIORITIES = ["low", "medium", "high", "urgent"]
+class Priority(IntEnum):
+    """Task priority, stored as its integer value (higher number = higher priority)."""
+    LOW = 1
+    MEDIUM = 2
+    HIGH = 3
+    URGENT = 4
+
+
+class Status(str, Enum):
+    """Task status, stored as its string value."""
+    TODO = "todo"
+    INPROGRESS = "inprogress"
+    DONE = "done"
+    BLOCKED = "blocked"
+
+
+# Built once at import so converting between names and values is a single lookup
+PRIORITY_BY_NAME = {priority.name.lower(): priority for priority in Priority}
+PRIORITY_NAMES = (None,) + tuple(priority.name.lower() for priority in Priority)
+VALID_STATUSES = frozenset(Status)
+
+
+def to_priority(value) -> Priority | None:
+    """Convert a priority name or integer to a Priority. Returns None if invalid."""
+    if isinstance(value, str):
+        return PRIORITY_BY_NAME.get(value)
+    try:
+        return Priority(value)
+    except ValueError:
+        return None
+
+
+class PriorityType(TypeDecorator):
+    """Stores a priority as a small integer and reads it back by name ("low" ... "urgent")."""
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        priority = to_priority(value)
+        return None if priority is None else int(priority)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else PRIORITY_NAMES[value]
+
+
+# Incomplete statuses as literal SQL, shared by the partial indexes and the queries
+# that should use them: SQLite only uses a partial index when the query repeats its
+# WHERE term, and a bound IN list (status IN (?, ?)) never matches it
+INCOMPLETE_STATUS_SQL = "status IN ('todo', 'inprogress')"
 
 
 class Task(Base):
     """Task model for storing tasks in the database."""
 
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Status-filtered list pages: equality on status, then newest first
+        Index("idx_task_status_created", "status", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     task_id = Column(String(36), unique=True, nullable=False, index=True)
     title = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
-    status = Column(String(20), nullable=False, default="todo", index=True)
-    priority = Column(String(20), nullable=False, default="medium", index=True)
+    status = Column(String(20), nullable=False, default="todo")
+    priority = Column(PriorityType, nullable=False, default=Priority.MEDIUM, index=True)
     due_date = Column(DateTime(timezone=True), nullable=True, index=True)
     parent_task_id = Column(String(36), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
@@ -58,9 +129,73 @@ class Task(Base):
         }
 
 
+# Focus Mode: incomplete tasks only, in exactly the query's ORDER BY, so the next
+# task is the first index entry and no sort step is needed
+Index(
+    "idx_task_focus_order",
+    Task.priority.desc(),
+    Task.due_date.is_(None),
+    Task.due_date,
+    Task.created_at,
+    sqlite_where=text(INCOMPLETE_STATUS_SQL)
+)
+
+# Partial index over incomplete tasks only, so it stays small as done tasks pile up
+Index(
+    "idx_task_incomplete",
+    Task.due_date,
+    Task.created_at,
+    sqlite_where=text(INCOMPLETE_STATUS_SQL)
+)
+
+
+class AICacheEntry(Base):
+    """Raw AI response stored under a hash of the prompt that produced it."""
+
+    __tablename__ = "ai_cache"
+
+    prompt_hash = Column(String(32), primary_key=True)
+    response_json = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
+class SemanticCacheEntry(Base):
+    """AI response stored with the embedding of the input that produced it."""
+
+    __tablename__ = "ai_semantic_cache"
+
+    namespace = Column(String(64), primary_key=True)
+    input_text = Column(Text, primary_key=True)
+    embedding = Column(LargeBinary, nullable=False)  # float32 unit vector
+    response_json = Column(Text, nullable=False)
+    last_used_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc), index=True)
+
+
+class OutdatedSchemaError(RuntimeError):
+    """The database file was created by an older, incompatible version of the schema."""
+
+
 def init_db():
     """Create all tables in the database."""
+    # Priorities used to be stored as text; there are no migrations, so refuse
+    # to start rather than fail mid-render on the old values
+    inspector = inspect(engine)
+    if inspector.has_table("tasks"):
+        columns = {column["name"]: column["type"] for column in inspector.get_columns("tasks")}
+        if not isinstance(columns.get("priority"), Integer):
+            raise OutdatedSchemaError(
+                "cognitask.db uses an older schema with text priorities. "
+                "Delete it and restart the app to recreate the database."
+            )
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # Superseded by idx_task_focus_order and idx_task_status_created
+        for name in ("idx_task_focus", "ix_tasks_status"):
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        # create_all skips existing tables, so add any indexes they are missing;
+        # IF NOT EXISTS because reflection cannot see expression indexes
+        for index in Task.__table__.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
 
 
 def get_db() -> Session:
@@ -85,24 +220,62 @@ def create_task(
     parent_task_id: str | None = None
 ) -> Task:
     """Create a new task."""
-    task = Task(
-        task_id=generate_task_id(),
-        title=title,
-        description=description,
-        status=status if status in VALID_STATUSES else "todo",
-        priority=priority if priority in VALID_PRIORITIES else "medium",
-        due_date=due_date,
-        parent_task_id=parent_task_id
-    )
-    db.add(task)
+    now = datetime.now(timezone.utc)
+    values = {
+        "task_id": generate_task_id(),
+        "title": title,
+        "description": description,
+        "status": status if status in VALID_STATUSES else "todo",
+        "priority": PRIORITY_NAMES[to_priority(priority) or Priority.MEDIUM],
+        "due_date": due_date,
+        "parent_task_id": parent_task_id,
+        "created_at": now,
+        "updated_at": now
+    }
+    # Every column value is known up front, so only the new id has to come back;
+    # this avoids the SELECT a refresh() after commit would issue
+    task_id = db.execute(insert(Task).values(**values).returning(Task.id)).scalar_one()
     db.commit()
-    db.refresh(task)
+
+    task = Task(id=task_id, **values)
+    make_transient_to_detached(task)
+    db.add(task)
     return task
 
 
+def create_tasks_bulk(db: Session, tasks: list[dict]) -> list[str]:
+    """
+    Create several tasks in one INSERT and one commit.
+    Each dict holds Task column values; task_id is generated and
+    missing or invalid status/priority fall back to the defaults.
+    Returns the new task_ids in input order.
+    """
+    if not tasks:
+        return []
+    task_ids = [generate_task_id() for _ in tasks]
+    rows = []
+    for task_id, task in zip(task_ids, tasks):
+        rows.append({
+            "description": None,
+            "due_date": None,
+            "parent_task_id": None,
+            **task,
+            "task_id": task_id,
+            "status": task.get("status") if task.get("status") in VALID_STATUSES else "todo",
+            "priority": to_priority(task.get("priority")) or Priority.MEDIUM
+        })
+    db.execute(insert(Task), rows)
+    db.commit()
+    return task_ids
+
+
+# Built once so every lookup reuses the same cached compiled statement
+_TASK_BY_ID = select(Task).where(Task.task_id == bindparam("tid"))
+
+
 def get_task_by_id(db: Session, task_id: str) -> Task | None:
     """Get a task by its task_id."""
-    return db.query(Task).filter(Task.task_id == task_id).first()
+    return db.execute(_TASK_BY_ID, {"tid": task_id}).scalar_one_or_none()
 
 
 def get_all_tasks(db: Session) -> list[Task]:
@@ -115,9 +288,44 @@ def get_tasks_by_status(db: Session, status: str) -> list[Task]:
     return db.query(Task).filter(Task.status == status).order_by(Task.created_at.desc()).all()
 
 
+# Columns needed to list tasks; leaves out the potentially large description
+TASK_LIST_COLUMNS = (Task.task_id, Task.title, Task.status, Task.priority, Task.due_date, Task.parent_task_id)
+
+
+def get_tasks_filtered(
+    db: Session,
+    status: str | None = None,
+    overdue: bool = False,
+    parent_task_id: str | None = None,
+    limit: int | None = None,
+    offset: int = 0
+) -> list:
+    """
+    Get the tasks a list view needs (newest first), filtered in SQL.
+    Returns rows with the TASK_LIST_COLUMNS fields plus an is_overdue flag
+    (past due and not done).
+    """
+    now = datetime.now(timezone.utc)
+    is_overdue = and_(Task.due_date < now, Task.status != "done").label("is_overdue")
+    stmt = select(*TASK_LIST_COLUMNS, is_overdue)
+    if status is not None:
+        stmt = stmt.where(Task.status == status)
+    if overdue:
+        stmt = stmt.where(Task.due_date < now, text(INCOMPLETE_STATUS_SQL))
+    if parent_task_id is not None:
+        stmt = stmt.where(Task.parent_task_id == parent_task_id)
+    stmt = stmt.order_by(Task.created_at.desc()).limit(limit).offset(offset)
+    return db.execute(stmt).all()
+
+
+def get_all_tasks_summary(db: Session) -> list:
+    """Get all tasks (newest first) as lightweight rows without descriptions."""
+    return get_tasks_filtered(db)
+
+
 def get_incomplete_tasks(db: Session) -> list[Task]:
     """Get all incomplete tasks (todo or inprogress)."""
-    return db.query(Task).filter(Task.status.in_(["todo", "inprogress"])).all()
+    return db.query(Task).filter(text(INCOMPLETE_STATUS_SQL)).all()
 
 
 def get_subtasks(db: Session, parent_task_id: str) -> list[Task]:
@@ -125,16 +333,27 @@ def get_subtasks(db: Session, parent_task_id: str) -> list[Task]:
     return db.query(Task).filter(Task.parent_task_id == parent_task_id).order_by(Task.created_at.asc()).all()
 
 
-def has_subtasks(db: Session, task_id: str) -> bool:
-    """Check if a task has any subtasks."""
-    return db.query(Task).filter(Task.parent_task_id == task_id).count() > 0
-
-
 def get_root_tasks(db: Session) -> list[Task]:
     """Get all tasks that don't have a parent (root level)."""
     return db.query(Task).filter(Task.parent_task_id == None).order_by(Task.created_at.desc()).all()
 
 
+# --- Plain Row Reads ---
+# Return read-only mappings instead of Task objects, skipping ORM object construction
+# and identity-map bookkeeping for read-only views.
+
+TASK_ROW_COLUMNS = (
+    Task.id, Task.task_id, Task.title, Task.status, Task.priority,
+    Task.due_date, Task.parent_task_id, Task.created_at, Task.updated_at
+)
+
+
+def get_subtasks_rows(db: Session, parent_task_id: str) -> list:
+    """Row variant of get_subtasks."""
+    stmt = select(*TASK_ROW_COLUMNS).where(Task.parent_task_id == parent_task_id).order_by(Task.created_at.asc())
+    return db.execute(stmt).mappings().all()
+
+
 def update_task(
     db: Session,
     task_id: str,
@@ -158,8 +377,8 @@ def update_task(
         task.description = description
     if status is not None and status in VALID_STATUSES:
         task.status = status
-    if priority is not None and priority in VALID_PRIORITIES:
-        task.priority = priority
+    if (new_priority := to_priority(priority)) is not None:
+        task.priority = new_priority
     if due_date is not None:
         task.due_date = due_date
     if clear_due_date:
@@ -169,7 +388,7 @@ def update_task(
     if clear_parent:
         task.parent_task_id = None
 
-    task.updated_at = datetime.now(timezone.utc)
+    # updated_at is set by the column's onupdate when anything changed
     db.commit()
     db.refresh(task)
     return task
@@ -177,65 +396,118 @@ def update_task(
 
 def delete_task(db: Session, task_id: str) -> bool:
     """Delete a task. Returns False if task not found or has subtasks."""
-    task = get_task_by_id(db, task_id)
-    if not task:
-        return False
+    # The subtask check runs inside the DELETE so it is a single statement
+    result = db.execute(
+        delete(Task).where(
+            Task.task_id == task_id,
+            ~exists().where(Task.parent_task_id == task_id)
+        )
+    )
+    db.commit()
+    return result.rowcount == 1
 
-    if has_subtasks(db, task_id):
-        return False
 
-    db.delete(task)
-    db.commit()
-    return True
+# Hand-written SQL for Focus Mode's single-row read; typed columns keep the
+# priority name and datetime conversions without ORM compilation or hydration
+_NEXT_PRIORITY_TASK_SQL = text(f"""
+    SELECT task_id, title, description, status, priority, due_date, parent_task_id, created_at, updated_at
+    FROM tasks
+    WHERE {INCOMPLETE_STATUS_SQL}
+    ORDER BY priority DESC, due_date IS NULL, due_date ASC, created_at ASC
+    LIMIT 1
+""").columns(
+    Task.task_id, Task.title, Task.description, Task.status, Task.priority,
+    Task.due_date, Task.parent_task_id, Task.created_at, Task.updated_at
+)
 
 
-def get_next_priority_task(db: Session) -> Task | None:
+def get_next_priority_task(db: Session) -> Row | None:
     """
-    Get the highest priority incomplete task for Focus Mode.
+    Get the highest priority incomplete task for Focus Mode, as a plain row.
     Priority order: urgent > high > medium > low
     Tie-breaker: earliest due date (nulls last), then oldest created
     """
-    # Create a case statement for priority ordering
-    priority_case = case(
-        (Task.priority == "urgent", 4),
-        (Task.priority == "high", 3),
-        (Task.priority == "medium", 2),
-        (Task.priority == "low", 1),
-        else_=0
-    )
-
-    return (
-        db.query(Task)
-        .filter(Task.status.in_(["todo", "inprogress"]))
-        .order_by(
-            priority_case.desc(),  # Higher priority first
-            Task.due_date.asc().nullslast(),  # Earlier due dates first, nulls last
-            Task.created_at.asc()  # Older tasks first
-        )
-        .first()
-    )
+    return db.execute(_NEXT_PRIORITY_TASK_SQL).first()
 
 
 def get_task_stats(db: Session) -> dict:
-    """Get statistics about tasks."""
-    total = db.query(Task).count()
-    todo = db.query(Task).filter(Task.status == "todo").count()
-    inprogress = db.query(Task).filter(Task.status == "inprogress").count()
-    done = db.query(Task).filter(Task.status == "done").count()
-    blocked = db.query(Task).filter(Task.status == "blocked").count()
-
-    # Count overdue tasks
+    """Get statistics about tasks, counted in a single pass over the table."""
     now = datetime.now(timezone.utc)
-    overdue = db.query(Task).filter(
-        Task.due_date < now,
-        Task.status.in_(["todo", "inprogress"])
-    ).count()
-
-    return {
-        "total": total,
-        "todo": todo,
-        "inprogress": inprogress,
-        "done": done,
-        "blocked": blocked,
-        "overdue": overdue
-    }
+
+    def count_where(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    row = db.execute(select(
+        func.count().label("total"),
+        count_where(Task.status == "todo").label("todo"),
+        count_where(Task.status == "inprogress").label("inprogress"),
+        count_where(Task.status == "done").label("done"),
+        count_where(Task.status == "blocked").label("blocked"),
+        count_where(and_(Task.due_date < now, Task.status.in_(["todo", "inprogress"]))).label("overdue")
+    )).one()
+
+    return dict(row._mapping)
+
+
+# --- AI Response Cache ---
+
+def get_ai_response(db: Session, prompt_hash: str) -> str | None:
+    """Get a stored AI response by prompt hash, or None if there is none."""
+    entry = db.get(AICacheEntry, prompt_hash)
+    return entry.response_json if entry else None
+
+
+def save_ai_response(db: Session, prompt_hash: str, response_json: str) -> None:
+    """Store an AI response, replacing any earlier one for the same prompt."""
+    db.merge(AICacheEntry(prompt_hash=prompt_hash, response_json=response_json))
+    db.commit()
+
+
+def get_semantic_cache_entries(db: Session) -> list[Row]:
+    """Get all semantic cache entries, least recently used first."""
+    return db.execute(
+        select(
+            SemanticCacheEntry.namespace,
+            SemanticCacheEntry.input_text,
+            SemanticCacheEntry.embedding,
+            SemanticCacheEntry.response_json
+        ).order_by(SemanticCacheEntry.last_used_at)
+    ).all()
+
+
+def touch_semantic_cache_entry(db: Session, namespace: str, input_text: str) -> None:
+    """Mark a semantic cache entry as just used."""
+    db.execute(
+        update(SemanticCacheEntry)
+        .where(SemanticCacheEntry.namespace == namespace, SemanticCacheEntry.input_text == input_text)
+        .values(last_used_at=datetime.now(timezone.utc))
+    )
+    db.commit()
+
+
+def save_semantic_cache_entry(
+    db: Session,
+    namespace: str,
+    input_text: str,
+    embedding: bytes,
+    response_json: str,
+    max_entries: int
+) -> None:
+    """Store a semantic cache entry, then evict the least recently used beyond max_entries."""
+    db.merge(SemanticCacheEntry(
+        namespace=namespace,
+        input_text=input_text,
+        embedding=embedding,
+        response_json=response_json,
+        last_used_at=datetime.now(timezone.utc)
+    ))
+    db.flush()  # The eviction below must count the new entry
+    cutoff = (
+        select(SemanticCacheEntry.last_used_at)
+        .order_by(SemanticCacheEntry.last_used_at.desc())
+        .offset(max_entries - 1)
+        .limit(1)
+        .scalar_subquery()
+    )
+    db.execute(delete(SemanticCacheEntry).where(SemanticCacheEntry.last_used_at < cutoff))
+    db.commit()
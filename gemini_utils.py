@@ -3,9 +3,18 @@ Gemini AI helper functions for CogniTask AI.
 Handles NLP task parsing and task breakdown.
 """
 
+import asyncio
+import functools
+import hashlib
+import inspect
 import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
+import numpy as np
 import streamlit as st
+import database as db
 
 try:
     import google.generativeai as genai
@@ -13,23 +22,126 @@ try:
 except ImportError:
     GEMINI_AVAILABLE = False
 
+# orjson parses noticeably faster; its JSONDecodeError subclasses json's
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
-def get_api_key() -> str | None:
-    """Get the Google AI API key from Streamlit secrets."""
-    try:
-        return st.secrets.get("GOOGLE_AI_API_KEY")
-    except Exception:
-        return None
+# Bump when a prompt template changes so stale exact-match responses are not reused
+PROMPT_VERSION = "1"
+RESPONSE_MEMO_SIZE = 512
 
+# Semantic cache settings; only near-verbatim rewordings should match,
+# since short inputs like "call mom" and "call dad" embed very closely
+SEMANTIC_CACHE_THRESHOLD = 0.97
+SEMANTIC_CACHE_SIZE = 500
+EMBEDDING_MODEL = "models/text-embedding-004"
 
-def is_configured() -> bool:
-    """Check if Gemini AI is properly configured."""
+
+class GeminiError(Exception):
+    """An async AI call failed; the message is meant to be shown to the user."""
+
+
+_API_KEY: str | None = None
+
+
+def get_api_key() -> str | None:
+    """Get the Google AI API key from Streamlit secrets, read once and then reused."""
+    global _API_KEY
+    if _API_KEY is None:
+        try:
+            _API_KEY = st.secrets.get("GOOGLE_AI_API_KEY")
+        except Exception:
+            return None
+    return _API_KEY
+
+
+def _check_configured() -> bool:
+    """Check if Gemini AI is available and has a real API key."""
     if not GEMINI_AVAILABLE:
         return False
     api_key = get_api_key()
     return api_key is not None and len(api_key) > 0 and api_key != "your-google-ai-api-key-here"
 
 
+# Checked once at import; restart the app after changing the API key
+_CONFIGURED = _check_configured()
+
+
+def is_configured() -> bool:
+    """Check if Gemini AI is properly configured."""
+    return _CONFIGURED
+
+
+# No spinner: first called from the AI event loop thread, which has no script context
+@st.cache_resource(show_spinner=False)
+def _configure_client() -> bool:
+    """Configure the Gemini client with the API key, once per process."""
+    genai.configure(api_key=get_api_key())
+    return True
+
+
+# No spinner: first called from the AI event loop thread, which has no script context
+@st.cache_resource(show_spinner=False)
+def _get_model():
+    """Return the shared model used for all prompts."""
+    _configure_client()
+    return genai.GenerativeModel(
+        "gemini-1.5-flash-latest",
+        generation_config=genai.types.GenerationConfig(
+            response_mime_type="application/json"
+        )
+    )
+
+
+# --- Exact Prompt Cache ---
+
+_response_memo: OrderedDict[str, str] = OrderedDict()
+_response_memo_lock = threading.Lock()
+
+
+def _prompt_hash(prompt: str) -> str:
+    """Hash a prompt, together with PROMPT_VERSION, into a cache key."""
+    return hashlib.blake2b((PROMPT_VERSION + prompt).encode(), digest_size=16).hexdigest()
+
+
+def _memoize_response(key: str, text: str):
+    """Keep a response in the in-memory LRU, evicting the oldest entry when full."""
+    with _response_memo_lock:
+        _response_memo[key] = text
+        _response_memo.move_to_end(key)
+        if len(_response_memo) > RESPONSE_MEMO_SIZE:
+            _response_memo.popitem(last=False)
+
+
+def _get_cached_response(key: str) -> str | None:
+    """Look a prompt hash up in memory, then in the ai_cache table."""
+    with _response_memo_lock:
+        if key in _response_memo:
+            _response_memo.move_to_end(key)
+            return _response_memo[key]
+    session = db.get_db()
+    try:
+        text = db.get_ai_response(session, key)
+    finally:
+        session.close()
+    if text is not None:
+        _memoize_response(key, text)
+    return text
+
+
+def _save_response(key: str, text: str):
+    """Store a response in memory and in the ai_cache table."""
+    _memoize_response(key, text)
+    session = db.get_db()
+    try:
+        db.save_ai_response(session, key, text)
+    finally:
+        session.close()
+
+
 def call_gemini(prompt: str) -> dict | None:
     """
     Call the Gemini API with a prompt and return parsed JSON response.
@@ -39,20 +151,18 @@ def call_gemini(prompt: str) -> dict | None:
         return None
 
     try:
-        api_key = get_api_key()
-        genai.configure(api_key=api_key)
+        key = _prompt_hash(prompt)
+        text = _get_cached_response(key)
+        if text is not None:
+            return _json_loads(text)
 
-        model = genai.GenerativeModel("gemini-1.5-flash-latest")
+        model = _get_model()
 
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                response_mime_type="application/json"
-            )
-        )
+        response = model.generate_content(prompt)
 
-        # Parse the JSON response
-        result = json.loads(response.text)
+        # Parse the JSON response, caching only responses that parse
+        result = _json_loads(response.text)
+        _save_response(key, response.text)
         return result
 
     except json.JSONDecodeError as e:
@@ -63,20 +173,226 @@ def call_gemini(prompt: str) -> dict | None:
         return None
 
 
-def parse_task_input(user_input: str) -> dict | None:
+async def call_gemini_async(prompt: str) -> dict | None:
     """
-    Parse natural language task input into structured task data.
+    Async variant of call_gemini, so several AI calls can be awaited together.
+    Returns None if AI is not configured; raises GeminiError on failure, since
+    it runs off the script thread where st.error cannot be shown.
+    """
+    if not is_configured():
+        return None
 
-    Returns dict with keys: title, description, priority, due_date
-    Or None on failure.
+    try:
+        key = _prompt_hash(prompt)
+        text = _get_cached_response(key)
+        if text is not None:
+            return _json_loads(text)
+
+        model = _get_model()
+
+        response = await model.generate_content_async(prompt)
+
+        # Parse the JSON response, caching only responses that parse
+        result = _json_loads(response.text)
+        _save_response(key, response.text)
+        return result
+
+    except json.JSONDecodeError as e:
+        raise GeminiError(f"Failed to parse AI response as JSON: {e}") from e
+    except Exception as e:
+        raise GeminiError(f"AI API error: {e}") from e
+
+
+@st.cache_resource
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Start the event loop that runs every async AI call, once per process.
+    The async Gemini client binds to the first loop that uses it, so all
+    calls must share one long-lived loop rather than asyncio.run() each.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="gemini-event-loop", daemon=True).start()
+    return loop
+
+
+def run_async(coro):
+    """
+    Run a coroutine on the shared AI event loop and wait for its result.
+    Errors from the AI calls are shown here, on the calling script thread.
+    Returns None on failure.
+    """
+    try:
+        return asyncio.run_coroutine_threadsafe(coro, _get_event_loop()).result()
+    except GeminiError as e:
+        st.error(str(e))
+        return None
+
+
+# --- Semantic Cache ---
+
+class SemanticCache:
     """
-    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    Cache of AI responses keyed by input embeddings, mirrored in the
+    ai_semantic_cache table. A lookup returns the response stored for the
+    most similar earlier input, if its cosine similarity reaches the threshold.
+    Beyond max_entries the least recently used entries are evicted.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_SIZE):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (namespace, input text) -> (unit embedding, response), least recently used first
+        self.entries: OrderedDict[tuple[str, str], tuple[np.ndarray, object]] = OrderedDict()
+        session = db.get_db()
+        try:
+            for row in db.get_semantic_cache_entries(session):
+                self.entries[(row.namespace, row.input_text)] = (
+                    np.frombuffer(row.embedding, dtype=np.float32),
+                    _json_loads(row.response_json)
+                )
+        finally:
+            session.close()
+
+    def lookup(self, namespace: str, embedding: np.ndarray):
+        """Return the cached response closest to the embedding, or None."""
+        with self._lock:
+            # Vectors from a different embedding model cannot be compared
+            candidates = [
+                (key, vector, response) for key, (vector, response) in self.entries.items()
+                if key[0] == namespace and vector.shape == embedding.shape
+            ]
+        if not candidates:
+            return None
+        scores = np.stack([vector for _, vector, _ in candidates]) @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+
+        key, _, response = candidates[best]
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+        session = db.get_db()
+        try:
+            db.touch_semantic_cache_entry(session, *key)
+        finally:
+            session.close()
+        return response
+
+    def store(self, namespace: str, text: str, embedding: np.ndarray, response):
+        """Store a response in memory and in the ai_semantic_cache table."""
+        with self._lock:
+            self.entries[(namespace, text)] = (embedding, response)
+            self.entries.move_to_end((namespace, text))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        session = db.get_db()
+        try:
+            db.save_semantic_cache_entry(
+                session, namespace, text, embedding.tobytes(), json.dumps(response), self.max_entries
+            )
+        finally:
+            session.close()
+
+
+# No spinner: first called from the AI event loop thread, which has no script context
+@st.cache_resource(show_spinner=False)
+def _get_semantic_cache() -> SemanticCache:
+    """Get the process-wide semantic cache, loaded from the database once."""
+    return SemanticCache()
+
 
-    prompt = f"""You are a task parsing assistant. Parse the following natural language input into a structured task.
+def _unit_vector(values) -> np.ndarray | None:
+    """Normalize an embedding so a dot product gives cosine similarity."""
+    vector = np.asarray(values, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
 
-Today's date is: {today}
 
-User input: "{user_input}"
+def _embed(text: str) -> np.ndarray | None:
+    """Embed text for cache lookups. Returns None if embedding fails."""
+    try:
+        _configure_client()
+        return _unit_vector(genai.embed_content(model=EMBEDDING_MODEL, content=text)["embedding"])
+    except Exception:
+        return None
+
+
+async def _aembed(text: str) -> np.ndarray | None:
+    """Async variant of _embed."""
+    try:
+        _configure_client()
+        result = await genai.embed_content_async(model=EMBEDDING_MODEL, content=text)
+        return _unit_vector(result["embedding"])
+    except Exception:
+        return None
+
+
+def semantic_cached(namespace: str, build_prompt):
+    """
+    Serve near-duplicate inputs of an AI helper from the semantic cache.
+    build_prompt turns the helper's arguments into its prompt; an exact
+    prompt cache hit skips the embedding round trip entirely.
+    Entries are keyed on PROMPT_VERSION, like the exact cache.
+    """
+    name = f"{namespace}:v{PROMPT_VERSION}"
+
+    def decorator(func):
+        def exact_hit(args, kwargs) -> bool:
+            return _get_cached_response(_prompt_hash(build_prompt(*args, **kwargs))) is not None
+
+        def cache_text(args, kwargs) -> str:
+            return "\n".join(str(a) for a in (*args, *kwargs.values()) if a)
+
+        def remember(text, embedding, result):
+            if embedding is not None and result is not None:
+                _get_semantic_cache().store(name, text, embedding, result)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not is_configured() or exact_hit(args, kwargs):
+                    return await func(*args, **kwargs)
+                text = cache_text(args, kwargs)
+                embedding = await _aembed(text)
+                if embedding is not None:
+                    cached = _get_semantic_cache().lookup(name, embedding)
+                    if cached is not None:
+                        return cached
+                result = await func(*args, **kwargs)
+                remember(text, embedding, result)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not is_configured() or exact_hit(args, kwargs):
+                return func(*args, **kwargs)
+            text = cache_text(args, kwargs)
+            embedding = _embed(text)
+            if embedding is not None:
+                cached = _get_semantic_cache().lookup(name, embedding)
+                if cached is not None:
+                    return cached
+            result = func(*args, **kwargs)
+            remember(text, embedding, result)
+            return result
+        return wrapper
+    return decorator
+
+
+# --- Task Parsing ---
+
+# Static prompt text, split around the parts that change per call
+_PARSE_PROMPT_TEMPLATE = (
+    """You are a task parsing assistant. Parse the following natural language input into a structured task.
+
+Today's date is: """,
+    """
+
+User input: \"""",
+    """"
 
 Extract the following information and return as JSON:
 - title: The main task action (required, be concise but complete)
@@ -91,37 +407,64 @@ Examples of priority indicators:
 - No indicator → "medium"
 
 Return ONLY valid JSON in this exact format:
-{{"title": "string", "description": "string or null", "priority": "string", "due_date": "string or null"}}
+{"title": "string", "description": "string or null", "priority": "string", "due_date": "string or null"}
 """
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _today_for_minute(minute: int) -> str:
+    """Format today's UTC date; cached per minute, which is the argument."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
 
-    result = call_gemini(prompt)
 
+def _today() -> str:
+    """Get today's UTC date as YYYY-MM-DD, recomputed at most once a minute."""
+    return _today_for_minute(int(time.time() // 60))
+
+
+def _build_parse_prompt(user_input: str) -> str:
+    """Build the prompt for parsing natural language task input."""
+    head, mid, tail = _PARSE_PROMPT_TEMPLATE
+    return f"{head}{_today()}{mid}{user_input}{tail}"
+
+
+def _normalize_parsed_task(result: dict | None) -> dict | None:
+    """Validate and normalize a parsed task returned by the AI."""
     if result and "title" in result:
         # Validate and normalize the result
         return {
             "title": str(result.get("title", ""))[:255],
             "description": result.get("description"),
-            "priority": result.get("priority", "medium") if result.get("priority") in ["low", "medium", "high", "urgent"] else "medium",
+            "priority": result.get("priority") if result.get("priority") in db.PRIORITY_BY_NAME else "medium",
             "due_date": result.get("due_date")
         }
 
     return None
 
 
-def breakdown_task(title: str, description: str | None = None) -> list[str] | None:
+def parse_task_input(user_input: str) -> dict | None:
     """
-    Break down a task into actionable sub-tasks.
+    Parse natural language task input into structured task data.
 
-    Returns a list of sub-task titles (3-7 items).
+    Returns dict with keys: title, description, priority, due_date
     Or None on failure.
     """
-    task_context = title
-    if description:
-        task_context += f"\n\nAdditional context: {description}"
+    return _normalize_parsed_task(call_gemini(_build_parse_prompt(user_input)))
 
-    prompt = f"""You are a task breakdown assistant. Break down the following task into smaller, actionable sub-tasks.
 
-Task: {task_context}
+async def aparse_task_input(user_input: str) -> dict | None:
+    """Async variant of parse_task_input."""
+    return _normalize_parsed_task(await call_gemini_async(_build_parse_prompt(user_input)))
+
+
+# --- Task Breakdown ---
+
+_BREAKDOWN_PROMPT_TEMPLATE = (
+    """You are a task breakdown assistant. Break down the following task into smaller, actionable sub-tasks.
+
+Task: """,
+    """
 
 Rules:
 - Create 3-7 specific, actionable sub-tasks
@@ -132,11 +475,21 @@ Rules:
 - Focus on concrete steps, not vague items like "research" without specifics
 
 Return ONLY valid JSON in this exact format:
-{{"sub_tasks": ["First sub-task", "Second sub-task", "Third sub-task"]}}
+{"sub_tasks": ["First sub-task", "Second sub-task", "Third sub-task"]}
 """
+)
+
+
+def _build_breakdown_prompt(title: str, description: str | None = None) -> str:
+    """Build the prompt for breaking a task down into sub-tasks."""
+    head, tail = _BREAKDOWN_PROMPT_TEMPLATE
+    if description:
+        return f"{head}{title}\n\nAdditional context: {description}{tail}"
+    return f"{head}{title}{tail}"
 
-    result = call_gemini(prompt)
 
+def _normalize_subtasks(result: dict | None) -> list[str] | None:
+    """Validate and clean the sub-task list returned by the AI."""
     if result and "sub_tasks" in result:
         sub_tasks = result["sub_tasks"]
         if isinstance(sub_tasks, list) and len(sub_tasks) >= 1:
@@ -144,3 +497,42 @@ Return ONLY valid JSON in this exact format:
             return [str(task)[:255] for task in sub_tasks if task and str(task).strip()]
 
     return None
+
+
+@semantic_cached("breakdown", _build_breakdown_prompt)
+def breakdown_task(title: str, description: str | None = None) -> list[str] | None:
+    """
+    Break down a task into actionable sub-tasks.
+
+    Returns a list of sub-task titles (3-7 items).
+    Or None on failure.
+    """
+    return _normalize_subtasks(call_gemini(_build_breakdown_prompt(title, description)))
+
+
+@semantic_cached("breakdown", _build_breakdown_prompt)
+async def abreakdown_task(title: str, description: str | None = None) -> list[str] | None:
+    """Async variant of breakdown_task."""
+    return _normalize_subtasks(await call_gemini_async(_build_breakdown_prompt(title, description)))
+
+
+# --- Concurrent Calls ---
+
+async def parse_and_breakdown(user_input: str) -> dict | None:
+    """
+    Parse task input and suggest sub-tasks for it concurrently.
+
+    Returns the parsed task with a "sub_tasks" list (None if the breakdown
+    failed), or None if AI is not configured. Raises GeminiError if parsing fails.
+    """
+    parsed, sub_tasks = await asyncio.gather(
+        aparse_task_input(user_input),
+        abreakdown_task(user_input),
+        return_exceptions=True
+    )
+    if isinstance(parsed, BaseException):
+        raise parsed
+    if parsed is None:
+        return None
+    # Sub-tasks are optional, so a failed breakdown still keeps the parsed task
+    return {**parsed, "sub_tasks": None if isinstance(sub_tasks, BaseException) else sub_tasks}